@@ -24,8 +24,13 @@
 # all you're doing is a quick edit.
 #
 # The basic save filename follows img.filename.
-# The copy, if any, is saved in a parasite:
-# export-scaled: filename\npercent\nwidth\nheight
+# The copy, if any, is saved in a parasite, export-copy-v2:
+# a version byte, then percent*1000, width and height as little-endian
+# 32-bit ints, followed by the UTF-8 filename.
+# Older versions (and the GIMP 2 saver.py) use a text parasite,
+# export-copy: filename\npercent\nwidth\nheight
+# That's still read if there's no export-copy-v2, but never written,
+# so older plug-ins don't choke on the binary format.
 
 # This plug-in is hosted at https://github.com/akkana/gimp-plugins/blob/master/saver.py
 
@@ -48,29 +53,146 @@ gi.require_version('Gdk', '3.0')
 from gi.repository import Gdk
 
 import os, sys
+import struct
 
 def N_(message): return message
 def _(message): return GLib.dgettext(None, message)
 
-busy = False
+# Set SAVER_DEBUG=1 in GIMP's environment to see what Saver is doing.
+_DEBUG = os.environ.get('SAVER_DEBUG') == '1'
 
+# Header of the export-copy-v2 parasite: version, percent*1000, width, height
+_PARASITE_NAME = 'export-copy-v2'
+_LEGACY_PARASITE_NAME = 'export-copy'
+_PARASITE_FMT = struct.Struct('<Biii')
+_PARASITE_VERSION = 1
 
-def gimp_file_save(image, layers, filepath):
-    """A PDB helper. Returns a Gimp.PDBStatusType"""
+_XCF_EXTS = frozenset({'.xcf'})
+_COMPRESSED = frozenset({'.gz', '.bz2'})
+
+
+def is_xcf(thefilename):
+    """Is thefilename an XCF, possibly compressed (.xcf.gz, .xcf.bz2)?"""
+    base, ext = os.path.splitext(thefilename)
+    ext = ext.lower()
+    if ext in _COMPRESSED:
+        base, ext = os.path.splitext(base)
+        ext = ext.lower()
+    return ext in _XCF_EXTS
+
+
+# The run mode never changes, and run_procedure only reads its arguments,
+# so one Value can be shared by every save.
+_RUNMODE_NI = GObject.Value(Gimp.RunMode, Gimp.RunMode.NONINTERACTIVE)
+
+
+def same_path(path1, path2):
+    """Do path1 and path2 refer to the same file?
+       Compares normalized paths, then asks the filesystem if both exist,
+       so things like ./foo.jpg or symlinks are caught.
+    """
+    if os.path.normpath(path1) == os.path.normpath(path2):
+        return True
+    try:
+        return os.path.samefile(path1, path2)
+    except OSError:
+        return False
+
+
+class _TempImage:
+    """A duplicate of an image that's deleted when the with block ends,
+       so a big copy can't be leaked even if saving it fails.
+    """
+    def __init__(self, src):
+        self.src = src
+        self.img = None
+
+    def __enter__(self):
+        self.img = self.src.duplicate()
+        return self.img
+
+    def __exit__(self, *exc):
+        try:
+            self.img.delete()
+        except Exception as e:
+            print("Couldn't delete temporary image:", e, file=sys.stderr)
+        return False
+
+
+def copy_settings_parasites(fromimg, toimg):
+    """Copy image type settings parasites, e.g. jpeg settings,
+       from fromimg to toimg.
+    """
+    names = [ n for n in fromimg.get_parasite_list()
+              if n.endswith(('-settings', '-save-options')) ]
+    for pname in names:
+        para = fromimg.get_parasite(pname)
+        if para:
+            toimg.attach_parasite(para)
+
+
+def merge_for_export(image):
+    """Collapse image's layers so it can be saved to a flat format.
+       Flatten if nothing is transparent, since that's a single pass;
+       otherwise merge visible layers so transparency (e.g. for PNG)
+       is kept.
+    """
+    if not any(l.has_alpha() for l in image.list_layers()):
+        image.flatten()
+    else:
+        image.merge_visible_layers(Gimp.MergeType.CLIP_TO_IMAGE)
+
+
+def prepare_copy(copyimg, copywidth, copyheight, need_merge):
+    """Scale copyimg, a duplicate of the original, and merge it
+       if need_merge, so it's ready to be saved as the copy.
+    """
+    if _DEBUG:
+        print("Scaling to", copywidth, 'x', copyheight)
+    copyimg.scale(copywidth, copyheight)
+    if need_merge:
+        merge_for_export(copyimg)
+        if _DEBUG:
+            print("Merging")
+
+
+def gimp_file_save(image, layers, gfile):
+    """A PDB helper: save image to gfile, a Gio.File.
+       Returns a Gimp.PDBStatusType
+    """
     return Gimp.get_pdb().run_procedure('gimp-file-save', [
-        GObject.Value(Gimp.RunMode, Gimp.RunMode.NONINTERACTIVE),
+        _RUNMODE_NI,
         GObject.Value(Gimp.Image, image),
         # Unlike some calls, file-save needs the size before the array
         GObject.Value(GObject.TYPE_INT, len(layers)),
         GObject.Value(Gimp.ObjectArray,
                       Gimp.ObjectArray.new(Gimp.Drawable,
                                           layers, False)),
-        GObject.Value(Gio.File, Gio.File.new_for_path(filepath))
+        GObject.Value(Gio.File, gfile)
     ])
 
 
-# A way to turn off notifications while we're calculating
-# busy = False
+def scale_dim(dim, num, den):
+    """dim * num / den, truncated to an int. Stays in integer arithmetic
+       when the user typed an integer, which is nearly always.
+    """
+    if isinstance(num, int):
+        return dim * num // den
+    return int(dim * num / den)
+
+
+# Given one of percent, width or height and the original image size,
+# return the (percent, width, height) the Saver As dialog should show.
+def sizes_from_percent(p, orig_width, orig_height):
+    return p, scale_dim(orig_width, p, 100), scale_dim(orig_height, p, 100)
+
+def sizes_from_width(w, orig_width, orig_height):
+    p = scale_dim(100, w, orig_width)
+    return p, w, scale_dim(orig_height, p, 100)
+
+def sizes_from_height(h, orig_width, orig_height):
+    p = scale_dim(100, h, orig_height)
+    return p, scale_dim(orig_width, p, 100), h
 
 
 class SaverPlugin(Gimp.PlugIn):
@@ -122,37 +244,48 @@ class SaverPlugin(Gimp.PlugIn):
     def save_both(image, filepath, copyname, copywidth, copyheight):
         '''Save the image, and also save the copy if appropriate,
            doing any duplicating or scaling that might be necessary.
-           Returns None on success, else a nonempty string error message.
+           Returns a Gimp.PDBStatusType: SUCCESS, or why it failed.
            Also sets the image's filename to filepath.
         '''
         msg = "Saving " + filepath
 
+        target = Gio.File.new_for_path(filepath)
         layers = image.list_selected_layers()
-
-        def is_xcf(thefilename):
-            base, ext = os.path.splitext(thefilename)
-            ext = ext.lower()
-            if ext == '.gz' or ext == '.bz2':
-                base, ext = os.path.splitext(base)
-                ext = ext.lower()
-            return (ext == '.xcf')
+        iw, ih = image.get_width(), image.get_height()
+
+        # Figure out the file types once, rather than every time we need them.
+        main_is_xcf = is_xcf(filepath)
+        copy_is_xcf = bool(copyname) and is_xcf(copyname)
+
+        # Decide right away whether there's a copy to save at all,
+        # so nothing is duplicated or merged for a copy that would just
+        # be the original again.
+        if copyname:
+            # If copyname isn't a full pathname, make it relative to
+            # the dirname of the main image.
+            copyfile = target.get_parent().resolve_relative_path(copyname)
+            copypath = copyfile.get_path()
+        # Only scale (and so duplicate) if the size actually changes.
+        need_scale = (copywidth and copyheight and
+                      (copywidth != iw or copyheight != ih))
+        need_copy = (copyname and need_scale
+                     and not same_path(copypath, filepath))
 
         # First, save the original image.
-        if is_xcf(filepath) or len(layers) < 2:
-            mainres = gimp_file_save(image, layers, filepath)
-            print("saved original to", filepath)
+        if main_is_xcf or len(layers) < 2:
+            mainres = gimp_file_save(image, layers, target)
+            if _DEBUG:
+                print("saved original to", filepath)
         else:
             # It's not XCF and it has multiple layers.
-            # We need to make a new image and flatten it.
-            copyimg = pdb.gimp_image_duplicate(img)
-            # Don't actually flatten since that will prevent saving
-            # transparent png.
-            #copyimg.flatten()
-            copyimage.merge_visible_layers(Gimp.MergeType.CLIP_TO_IMAGE)
-            mainres = gimp_file_save(copyimage, [copyimg.active_layer],
-                                     filepath)
-            gimp.delete(copyimg)
-            print("merged layers then saved to", filepath)
+            # We need to make a new image and merge it.
+            with _TempImage(image) as copyimg:
+                merge_for_export(copyimg)
+                mainres = gimp_file_save(copyimg,
+                                         copyimg.list_selected_layers(),
+                                         target)
+            if _DEBUG:
+                print("merged layers then saved to", filepath)
 
         # print("result of main img gimp-file-save:", mainres, mainres.index(0))
         if (mainres.index(0) != Gimp.PDBStatusType.SUCCESS):
@@ -161,38 +294,37 @@ class SaverPlugin(Gimp.PlugIn):
 
         # The important part is done, so mark the image clean
         # and record the filename: set_file expects a Gio.File.
-        image.set_file(Gio.File.new_for_path(filepath))
+        image.set_file(target)
         image.clean_all()
 
-        print("Saver: copy is %s (%dx%d)" % (copyname, copywidth, copyheight))
+        if _DEBUG:
+            print("Saver: copy is %s (%dx%d)" % (copyname,
+                                                 copywidth, copyheight))
 
         # Now try to save the copy, if applicable
-        if (not copyname or not copywidth or not copyheight or
-            copyname == filepath or copyname == os.path.basename(filepath)
-            or (copywidth == image.get_width()
-                and copyheight == image.get_height())):
-            print("No need to save a copy")
-            return mainres
+        if not need_copy:
+            if _DEBUG:
+                print("No need to save a copy")
+            return Gimp.PDBStatusType.SUCCESS
 
         # Set up the parasite with information about the copied image,
         # so it will be saved with the main XCF image.
-        if copywidth and copyheight:
-            # print("percent is", copywidth, "* 100.0 /", image.get_width())
-            # print("types:", type(copywidth), type(image.get_width()))
-            percent = copywidth * 100.0 / image.get_width()
-            # Note that this allows changed aspect ratios,
-            # though the Saver As dialog doesn't allow that.
-            parastring = '%s\n%d\n%d\n%d' % (copyname, percent,
-                                             copywidth, copyheight)
-            msg += "Saving a scaled copy '%s' (%dx%d), " \
-                % (copyname, copywidth, copyheight)
-        else:
-            parastring = '%s\n100.0\n0\n0' % (copyname)
-        print("Saving parasite:", parastring, "(end of parastring)")
-        para = Gimp.Parasite.new("export-copy", 1, parastring.encode())
-        print("trying to attach parasite to main image:", para)
-        print("parasite name:", para.name)
-        print("Parasite data:", bytes(para.get_data()))
+        # need_copy means there's always a width and height here.
+        percent = copywidth * 100.0 / iw
+        # Note that this allows changed aspect ratios,
+        # though the Saver As dialog doesn't allow that.
+        paradata = _PARASITE_FMT.pack(_PARASITE_VERSION,
+                                      int(percent * 1000),
+                                      copywidth, copyheight)
+        paradata += copyname.encode('utf-8')
+        msg += "Saving a scaled copy '%s' (%dx%d), " \
+            % (copyname, copywidth, copyheight)
+        if _DEBUG:
+            print("Saving parasite:", paradata, "(end of parasite data)")
+        para = Gimp.Parasite.new(_PARASITE_NAME, 1, paradata)
+        if _DEBUG:
+            print("trying to attach parasite to main image:", para)
+            print("parasite name:", para.name)
         image.attach_parasite(para)
 
         # Don't use gimp_message -- it can pop up a dialog.
@@ -205,95 +337,78 @@ class SaverPlugin(Gimp.PlugIn):
         # Is there any point to pushing and popping the context?
         #gimp.context_pop()
 
-        # If copyname isn't a full pathname, make it relative to
-        # the dirname of the main image.
-        if copyname.startswith('/'):
-            copypath = copyname
-        else:
-            copypath = os.path.join(os.path.dirname(filepath), copyname)
-
         # Now the parasite is safely attached, and we can save to copypath.
         # Alas, we can't attach the JPEG settings parasite until after
         # we've saved the copy, so that won't get saved with the main image
         # though it will be attached to the image and remembered in
         # this session, and the next time we save it should be remembered.
 
-        imglayers = image.list_selected_layers()
-
-        # We'll need a new image if the copy is non-xcf and we have more
-        # than one layer, or if we're scaling.
-        if (copywidth and copyheight):
-            # We're scaling!
-            copyimg = image.duplicate()
-            print("Scaling to", copywidth, 'x', copyheight)
-            copyimg.scale(copywidth, copyheight)
-            if len(imglayers) > 1 and not is_xcf(copyname):
-                copyimg.merge_visible_layers(copyimg, CLIP_TO_IMAGE)
-                print("Also merging")
-            else:
-                print("No need to merge")
-
-        elif len(imglayers) > 1 and not is_xcf(copyname):
-            # We're not scaling, but we still need to flatten.
-            copyimg = image.duplicate()
-            # copyimg.flatten()
-            copyimg.merge_visible_layers(copyimg, CLIP_TO_IMAGE)
-            print("Merging but not scaling")
+        # The copy is always scaled, so it's always a new image;
+        # it also needs merging if it's non-xcf and has several layers.
+        need_merge = len(layers) > 1 and not copy_is_xcf
+        with _TempImage(image) as copyimg:
+            prepare_copy(copyimg, copywidth, copyheight, need_merge)
+            # gimp-file-save insists on being passed a valid layer,
+            # even if saving to a multilayer format such as XCF.
+            copylayers = copyimg.list_selected_layers()
+            if _DEBUG:
+                print("Calling gimp_file_save for copy",
+                      copyimg, copylayers, copypath)
+            copyres = gimp_file_save(copyimg, copylayers, copyfile)
+
+            # Find any image type settings parasites (e.g. jpeg
+            # settings) that got set during save, so we'll be able
+            # to use them next time.
+            if copyres.index(0) == Gimp.PDBStatusType.SUCCESS:
+                copy_settings_parasites(copyimg, image)
 
-        else:
-            copyimg = image
-            print("Not scaling or flattening")
-
-        # gimp-file-save insists on being passed a valid layer,
-        # even if saving to a multilayer format such as XCF. Go figure.
-        copylayers = copyimg.list_selected_layers()
-        print("Calling gimp_file_save for copy", copyimg, copylayers, copypath)
-        copyres = gimp_file_save(copyimg, copylayers, copypath)
         if (copyres.index(0) != Gimp.PDBStatusType.SUCCESS):
             print("Failed to save the copy")
             return copyres.index(0)
 
-        # Find any image type settings parasites (e.g. jpeg settings)
-        # that got set during save, so we'll be able to use them
-        # next time.
-        def copy_settings_parasites(fromimg, toimg):
-            if fromimg == toimg:
-                print("Same image, not copying")
-                return
-            for pname in fromimg.get_parasite_list():
-                if pname[-9:] == '-settings' or pname[-13:] == '-save-options':
-                    para = fromimg.get_parasite(pname)
-                    if para:
-                        toimg.attach_parasite(pname, para.flags, para.data)
-
-        # Copy any settings parasites we may have saved from previous runs:
-        copy_settings_parasites(copyimg, image)
-
-        gimp.delete(copyimg)
-        return None
+        return Gimp.PDBStatusType.SUCCESS
 
     def init_from_parasite(self, img):
         '''Returns copyname, percent, width, height.'''
-        para = img.get_parasite('export-copy')
+        para = img.get_parasite(_PARASITE_NAME)
+        legacy = not para
+        if legacy:
+            para = img.get_parasite(_LEGACY_PARASITE_NAME)
         if para:
-            print("Got parasite!")
+            if _DEBUG:
+                print("Got parasite!")
             try:
-                data = bytes(para.get_data()).decode()
-                print("Parasite data:", data)
-                paravals = [ 0 if x == 'None' or x == '' else x
-                             for x in data.split('\n') ]
-                self.copyname = paravals[0]
-                self.export_percent = float(paravals[1])
-                self.export_width = int(paravals[2])
-                self.export_height = int(paravals[3])
-                print("Read parasite values",
-                      self.copyname, self.export_percent,
-                      self.export_width, self.export_height)
+                data = bytes(para.get_data())
+                if _DEBUG:
+                    print("Parasite data:", data)
+                if not legacy:
+                    version, percent, width, height = \
+                        _PARASITE_FMT.unpack_from(data, 0)
+                    if version != _PARASITE_VERSION:
+                        raise ValueError("Unknown %s version %d"
+                                         % (_PARASITE_NAME, version))
+                    self.copyname = \
+                        data[_PARASITE_FMT.size:].decode('utf-8')
+                    self.export_percent = percent / 1000.
+                    self.export_width = width
+                    self.export_height = height
+                else:
+                    paravals = [ 0 if x == 'None' or x == '' else x
+                                 for x in data.decode().split('\n') ]
+                    self.copyname = paravals[0]
+                    self.export_percent = float(paravals[1])
+                    self.export_width = int(paravals[2])
+                    self.export_height = int(paravals[3])
+                if _DEBUG:
+                    print("Read parasite values",
+                          self.copyname, self.export_percent,
+                          self.export_width, self.export_height)
             except Exception as e:
                 print("Exception getting parasite values:", e)
                 para = None
         if not para:
-            print("No parasite")
+            if _DEBUG:
+                print("No parasite")
             self.copyname = None
             self.export_percent = 100.0
             self.export_width = img.get_width()
@@ -307,28 +422,34 @@ class SaverPlugin(Gimp.PlugIn):
         # print("args:", [x for x in args])
         # print("data:", [x for x in data])
 
-        if not image.get_file():    # No filename set yet
-            print("No filename set! Showing dialog")
+        gfile = image.get_file()
+        if not gfile:    # No filename set yet
+            if _DEBUG:
+                print("No filename set! Showing dialog")
             return self.saver_as_dialog(procedure, run_mode,
                                         image, n_drawables, drawables,
                                         args, data)
 
-        filepath = image.get_file().get_path()
+        filepath = gfile.get_path()
 
         # Now see if there's a parasite with copyimg info
         self.init_from_parasite(image)
 
-        if self.copyname:
-            print("Image has parasite data: copyname is", self.copyname,
-                  "at", self.export_width, "x", self.export_height)
-        print("Image's file is:", image.get_file().get_path())
+        if _DEBUG:
+            if self.copyname:
+                print("Image has parasite data: copyname is", self.copyname,
+                      "at", self.export_width, "x", self.export_height)
+            print("Image's file is:", filepath)
 
         save_err = self.save_both(image, filepath,
                                   self.copyname,
                                   self.export_width, self.export_height)
-        print("save_both returned", save_err)
-        print("Now image.get_file() is",
-              image.get_file(), image.get_file().get_path())
+        if _DEBUG:
+            print("save_both returned", save_err)
+            gfile = image.get_file()
+            print("Now image.get_file() is", gfile, gfile.get_path())
+
+        return procedure.new_return_values(save_err, GLib.Error())
 
     def saver_as_dialog(self, procedure, run_mode, image,
                         n_drawables, drawables,
@@ -360,13 +481,23 @@ class SaverPlugin(Gimp.PlugIn):
             filepath = chooser.get_filename()
             copyname, percent, copywidth, copyheight = chooser.get_copy_info()
 
+            # The PDB isn't thread-safe, so the save has to happen here
+            # in the main thread. But let the dialog redraw first,
+            # so it doesn't sit there looking hung during a big save.
+            chooser.show_warning("Saving %s ..." % filepath)
+            chooser.set_sensitive(False)
+            while Gtk.events_pending():
+                Gtk.main_iteration()
+
             save_err = self.save_both(image, filepath,
                                       copyname, copywidth, copyheight)
-            if save_err.index(0) == Gimp.PDBStatusType.SUCCESS:
+            if save_err == Gimp.PDBStatusType.SUCCESS:
                 chooser.destroy()
                 return procedure.new_return_values(Gimp.PDBStatusType.SUCCESS,
                                                    GLib.Error())
             print("SAVER looping:", save_err, file=sys.stderr)
+            chooser.show_warning("Couldn't save %s" % filepath)
+            chooser.set_sensitive(True)
 
 
 class SaverChooserWin(Gtk.FileChooserDialog):
@@ -374,6 +505,11 @@ class SaverChooserWin(Gtk.FileChooserDialog):
         self.image = image
         self.saver = saver
 
+        # Recalculating sizes is deferred to an idle callback, so a burst
+        # of changes only updates the other entries once.
+        self.pending_scale = None
+        self.pending_which = None
+
         # Create the dialog
         title = "GIMP Saver"
         if image.get_name():
@@ -388,14 +524,16 @@ class SaverChooserWin(Gtk.FileChooserDialog):
 
         # Obey the window manager quit signal:
         self.connect("destroy", Gtk.main_quit)
+        self.connect("destroy", self.cancel_pending_scale)
 
         imagefile = image.get_file()
         if imagefile:
-            path = image.get_file().get_path()
-            print("Existing path:", path)
+            path = imagefile.get_path()
+            if _DEBUG:
+                print("Existing path:", path)
             self.set_current_folder(os.path.dirname(path))
             self.set_filename(path)
-        else:
+        elif _DEBUG:
             print("saver: image doesn't have a filename yet")
 
         # filter = Gtk.FileFilter()
@@ -403,7 +541,10 @@ class SaverChooserWin(Gtk.FileChooserDialog):
         # filter.add_pattern('*')
         # self.add_filter(filter)
 
-        copybox = Gtk.Table(n_rows=3, n_columns=7)
+        copybox = Gtk.Grid()
+        copybox.set_row_spacing(5)
+        copybox.set_column_spacing(5)
+        copybox.set_border_width(5)
 
         l = Gtk.Label(label="Saver: Export a copy")
         # name in Gtk css acts like id in html css
@@ -413,55 +554,64 @@ class SaverChooserWin(Gtk.FileChooserDialog):
         # styling ... then didn't include alignment in Label's supported CSS
         # and instead made a new function, set_halign. Go figure.
         l.set_halign(Gtk.Align.START)
-        copybox.attach(l, 0, 3, 0, 1, xpadding=5, ypadding=5)
+        copybox.attach(l, 0, 0, 3, 1)
 
         l = Gtk.Label(label="Export a copy to:")
-        copybox.attach(l, 0, 1, 1, 2, xpadding=5, ypadding=5)
+        copybox.attach(l, 0, 1, 1, 1)
 
         self.copyname_e = Gtk.Entry()
         if self.saver.copyname:
             self.copyname_e.set_text(self.saver.copyname)
-        copybox.attach(self.copyname_e, 1, 7, 1, 2, xpadding=5, ypadding=5)
+        self.copyname_e.set_hexpand(True)
+        copybox.attach(self.copyname_e, 1, 1, 6, 1)
 
         l = Gtk.Label(label="Scale the copy:")
-        copybox.attach(l, 0, 1, 2, 3, xpadding=5, ypadding=5)
+        copybox.attach(l, 0, 2, 1, 1)
 
         l = Gtk.Label(label="Percent:")
-        copybox.attach(l, 1, 2, 2, 3, xpadding=5, ypadding=5)
+        copybox.attach(l, 1, 2, 1, 1)
 
         adj = Gtk.Adjustment(value=int(self.saver.export_percent),
                              lower=1, upper=10000,
                              step_increment=1, page_increment=10, page_size=0)
         self.percent_e = Gtk.SpinButton.new(adj, 0, 0)
-        copybox.attach(self.percent_e, 2, 3, 2, 3, xpadding=5, ypadding=5)
+        copybox.attach(self.percent_e, 2, 2, 1, 1)
 
         l = Gtk.Label(label="Width:")
-        copybox.attach(l, 3, 4, 2, 3, xpadding=5, ypadding=5)
+        copybox.attach(l, 3, 2, 1, 1)
 
         adj = Gtk.Adjustment(value=int(self.saver.export_width),
                              lower=1, upper=10000,
                              step_increment=1, page_increment=10, page_size=0)
         self.width_e = Gtk.SpinButton.new(adj, 0, 0)
-        copybox.attach(self.width_e, 4, 5, 2, 3, xpadding=5, ypadding=5)
+        copybox.attach(self.width_e, 4, 2, 1, 1)
 
         l = Gtk.Label(label="Height:")
-        copybox.attach(l, 5, 6, 2, 3, xpadding=5, ypadding=5)
+        copybox.attach(l, 5, 2, 1, 1)
 
         adj = Gtk.Adjustment(value=int(self.saver.export_height),
                              lower=1, upper=10000,
                              step_increment=1, page_increment=10, page_size=0)
         self.height_e = Gtk.SpinButton.new(adj, 0, 0)
-        copybox.attach(self.height_e, 6, 7, 2, 3, xpadding=5, ypadding=5)
+        copybox.attach(self.height_e, 6, 2, 1, 1)
 
         # Now that the widgets are created, connect their entry_changed
         self.percent_e.connect("changed", self.entry_changed, 'p');
         self.width_e.connect("changed", self.entry_changed, 'w');
         self.height_e.connect("changed", self.entry_changed, 'h');
 
+        # For each entry, its spinbox and how to get
+        # (percent, width, height) from its value.
+        self.scale_axes = {
+            'p': (self.percent_e, sizes_from_percent),
+            'w': (self.width_e, sizes_from_width),
+            'h': (self.height_e, sizes_from_height),
+        }
+
         self.warning_label = Gtk.Label(label="")
         self.warning_label.set_name("saverwarning")
         self.warning_label.set_halign(Gtk.Align.START)
-        copybox.attach(self.warning_label, 0, 7, 3, 4, xpadding=5, ypadding=5)
+        copybox.attach(self.warning_label, 0, 3, 7, 1)
 
         self.set_extra_widget(copybox)
 
@@ -475,6 +625,12 @@ class SaverChooserWin(Gtk.FileChooserDialog):
     def get_copy_info(self):
         """Return copyname, percent, width, height from the Saver As dialog
         """
+        # If the user hit Enter right after typing a size, the other
+        # entries might not have been updated yet.
+        if self.pending_scale:
+            self.cancel_pending_scale()
+            self.apply_scale()
+
         try:
             percent = float(self.percent_e.get_text())
         except ValueError:
@@ -494,10 +650,22 @@ class SaverChooserWin(Gtk.FileChooserDialog):
         else:
             self.warning_label.set_text('')
 
+    def cancel_pending_scale(self, *args):
+        if self.pending_scale:
+            GLib.source_remove(self.pending_scale)
+            self.pending_scale = None
+
     def entry_changed(self, entry, which):
-        global busy
-        if busy:
-            return
+        self.pending_which = which
+        if not self.pending_scale:
+            self.pending_scale = GLib.idle_add(self.apply_scale)
+
+    def apply_scale(self):
+        """Update the other two size entries to match the one
+           that changed last.
+        """
+        self.pending_scale = None
+        which = self.pending_which
 
         # Can't use get_value() or get_value_as_int() because they
         # don't work before an update(), but update() will usually
@@ -517,40 +685,24 @@ class SaverChooserWin(Gtk.FileChooserDialog):
                 except ValueError:
                     return 0
 
-        orig_width = self.image.get_width()
-        orig_height = self.image.get_height()
-
-        if which == 'p':
-            p = get_num_value(self.percent_e)
-            if not p: return
-            busy = True
-            w = int(orig_width * p / 100.)
-            self.width_e.set_text(str(w))
-            h = int(orig_height * p / 100.)
-            self.height_e.set_text(str(h))
-            busy = False
-
-        elif which == 'w':
-            w = get_num_value(self.width_e)
-            if not w: return
-            busy = True
-            p = int(w * 100. / orig_width)
-            self.percent_e.set_text(str(p))
-            h = int(orig_height * p / 100.)
-            self.height_e.set_text(str(h))
-            busy = False
-
-        elif which == 'h':
-            h = get_num_value(self.height_e)
-            if not h: return
-            busy = True
-            p = int(h * 100. / orig_height)
-            self.percent_e.set_text(str(p))
-            w = int(orig_width * p / 100.)
-            self.width_e.set_text(str(w))
-            busy = False
-        else:
-            print("I'm confused -- not width, height or percentage:", which)
+        spinbox, sizes_from = self.scale_axes[which]
+        val = get_num_value(spinbox)
+        if not val:
+            return GLib.SOURCE_REMOVE
+        sizes = sizes_from(val, self.image.get_width(), self.image.get_height())
+
+        # Turn off notifications while we set the entries,
+        # and leave alone the one the user is typing in.
+        spinboxes = (self.percent_e, self.width_e, self.height_e)
+        for spinbox in spinboxes:
+            spinbox.handler_block_by_func(self.entry_changed)
+        for axis, spinbox, size in zip('pwh', spinboxes, sizes):
+            if axis != which:
+                spinbox.set_text(str(size))
+        for spinbox in spinboxes:
+            spinbox.handler_unblock_by_func(self.entry_changed)
+
+        return GLib.SOURCE_REMOVE
 
 
 Gimp.main(SaverPlugin.__gtype__, sys.argv)